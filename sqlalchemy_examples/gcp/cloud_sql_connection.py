@@ -20,11 +20,12 @@ class Teacher(Base):
     __tablename__ = "teachers"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    name: Mapped[str] = mapped_column(String(100))  # Explicit length for MySQL
+    # Explicit length for MySQL
+    name: Mapped[str] = mapped_column(String(100), index=True)
     subject: Mapped[str] = mapped_column(String(100))
 
     students: Mapped[List["Student"]] = relationship(
-        back_populates="teacher", cascade="all, delete-orphan"
+        back_populates="teacher", cascade="all, delete-orphan", lazy="selectin"
     )
 
     def __repr__(self) -> str:
@@ -38,8 +39,8 @@ class Student(Base):
     name: Mapped[str] = mapped_column(String(100))
     grade: Mapped[int] = mapped_column()
 
-    teacher_id: Mapped[int] = mapped_column(ForeignKey("teachers.id"))
-    teacher: Mapped["Teacher"] = relationship(back_populates="students")
+    teacher_id: Mapped[int] = mapped_column(ForeignKey("teachers.id"), index=True)
+    teacher: Mapped["Teacher"] = relationship(back_populates="students", lazy="joined")
 
     def __repr__(self) -> str:
         return f"Student(id={self.id}, name={self.name}, grade={self.grade})"
@@ -52,10 +53,10 @@ def get_engine():
     engine = create_engine(
         f"mysql+pymysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@"
         f"127.0.0.1:{os.getenv('DB_PORT', '13306')}/{os.getenv('DB_NAME')}",
-        echo=True,
+        echo=os.getenv("DB_ECHO", "false") in ("true", "1", "t"),
         pool_size=5,
         max_overflow=10,
-        pool_pre_ping=True,
+        pool_pre_ping=os.getenv("DB_POOL_PRE_PING", "false") in ("true", "1", "t"),
         pool_recycle=3600,
     )
     return engine
@@ -66,10 +67,10 @@ def get_engine():
 #     engine = create_engine(
 #         f"mysql+pymysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@"
 #         f"{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}?ssl_ca={os.getenv('SSL_CA_PATH')}",
-#         echo=True,
+#         echo=os.getenv("DB_ECHO", "false") in ("true", "1", "t"),
 #         pool_size=5,
 #         max_overflow=10,
-#         pool_pre_ping=True,
+#         pool_pre_ping=os.getenv("DB_POOL_PRE_PING", "false") in ("true", "1", "t"),
 #         pool_recycle=3600,
 #     )
 #     return engine
@@ -3,9 +3,17 @@ from typing import List, Tuple
 
 from dotenv import load_dotenv
 import pandas as pd
-from sqlalchemy import ForeignKey, String, select, text
+from sqlalchemy import ForeignKey, String, func, insert, inspect, select, text
 from sqlalchemy.engine import create_engine
-from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column, relationship
+from sqlalchemy.orm import (
+    DeclarativeBase,
+    Mapped,
+    Session,
+    mapped_column,
+    relationship,
+    selectinload,
+)
+from sqlalchemy.pool import NullPool
 
 
 # Source environment variables
@@ -23,12 +31,14 @@ class Teacher(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True)
     # You have to specify a string length for MySQL
-    name: Mapped[str] = mapped_column(String(100))
+    # (the name index is declared with the column: on MySQL, dropping and
+    # rebuilding it around the import would commit the transaction early)
+    name: Mapped[str] = mapped_column(String(100), index=True)
     subject: Mapped[str] = mapped_column(String(100))
 
     # Relationship: one teacher has many students
     students: Mapped[List["Student"]] = relationship(
-        back_populates="teacher", cascade="all, delete-orphan"
+        back_populates="teacher", cascade="all, delete-orphan", lazy="selectin"
     )
 
     def __repr__(self) -> str:
@@ -44,125 +54,153 @@ class Student(Base):
     grade: Mapped[int] = mapped_column()
 
     # Foreign key to link to the teacher
-    teacher_id: Mapped[int] = mapped_column(ForeignKey("teachers.id"))
+    teacher_id: Mapped[int] = mapped_column(ForeignKey("teachers.id"), index=True)
 
     # Relationship: many students have one teacher
-    teacher: Mapped["Teacher"] = relationship(back_populates="students")
+    teacher: Mapped["Teacher"] = relationship(back_populates="students", lazy="joined")
 
     def __repr__(self) -> str:
         return f"Student(id={self.id}, name={self.name}, grade={self.grade})"
 
 
+# Sample data: one (name, subject) tuple per teacher
+TEACHERS = (
+    ("Ms. Johnson", "Mathematics"),
+    ("Mr. Smith", "History"),
+    ("Dr. Garcia", "Science"),
+)
+
+# Sample data: one (name, grade, teacher_name) tuple per student
+# Note: We include the teacher's name to link to teachers
+STUDENTS = (
+    ("Alice", 95, "Ms. Johnson"),  # Math students
+    ("Bob", 87, "Ms. Johnson"),
+    ("Charlie", 91, "Ms. Johnson"),
+    ("Diana", 82, "Mr. Smith"),  # History students
+    ("Edward", 88, "Mr. Smith"),
+    ("Fatima", 94, "Dr. Garcia"),  # Science students
+    ("George", 79, "Dr. Garcia"),
+    ("Hannah", 90, "Dr. Garcia"),
+)
+
+
 def create_sample_dataframe() -> Tuple[pd.DataFrame, pd.DataFrame]:
     """Create sample pandas DataFrames for teachers and students."""
 
-    # Create a DataFrame for teachers
-    teachers_data = {
-        "name": ["Ms. Johnson", "Mr. Smith", "Dr. Garcia"],
-        "subject": ["Mathematics", "History", "Science"],
-    }
-    teachers_df = pd.DataFrame(teachers_data)
-
-    # Create a DataFrame for students
-    # Note: We include a 'teacher_name' column to link to teachers
-    students_data = {
-        "name": [
-            "Alice",
-            "Bob",
-            "Charlie",
-            "Diana",
-            "Edward",
-            "Fatima",
-            "George",
-            "Hannah",
-        ],
-        "grade": [95, 87, 91, 82, 88, 94, 79, 90],
-        "teacher_name": [
-            "Ms. Johnson",
-            "Ms. Johnson",
-            "Ms. Johnson",  # Math students
-            "Mr. Smith",
-            "Mr. Smith",  # History students
-            "Dr. Garcia",
-            "Dr. Garcia",
-            "Dr. Garcia",  # Science students
-        ],
-    }
-    students_df = pd.DataFrame(students_data)
+    # Build each DataFrame with a single constructor call from the row tuples
+    teachers_df = pd.DataFrame(TEACHERS, columns=["name", "subject"])
+    students_df = pd.DataFrame(STUDENTS, columns=["name", "grade", "teacher_name"])
 
     return teachers_df, students_df
 
 
+def _fast_insert(table, conn, keys, data_iter) -> None:
+    """`DataFrame.to_sql()` insert method: one DBAPI executemany() per chunk."""
+    # The rows go to the driver as plain tuples, with no per-row SQLAlchemy
+    # processing (pymysql then rewrites them into multi-row INSERTs)
+    columns = ", ".join(keys)
+    placeholders = ", ".join(["%s"] * len(keys))
+    cursor = conn.connection.cursor()
+    cursor.executemany(
+        f"INSERT INTO {table.name} ({columns}) VALUES ({placeholders})", data_iter
+    )
+    cursor.close()
+
+
 def populate_from_dataframes(
-    engine, teachers_df: pd.DataFrame, students_df: pd.DataFrame
+    session: Session, teachers_df: pd.DataFrame, students_df: pd.DataFrame
 ) -> None:
-    with Session(engine) as session:
+    with session.begin():
         # Check if we already have data
         result = session.execute(select(Teacher)).first()
         if result is not None:
             print("ℹ️ Database already contains data")
             return
 
-        # Step 1: Create a dictionary to map teacher names to teacher objects
-        teacher_map = {}
-
-        # Step 2: Insert teachers and build the mapping
-        for _, row in teachers_df.iterrows():
-            teacher = Teacher(name=row["name"], subject=row["subject"])
-            session.add(teacher)
-            # We need to flush to get the ID assigned by the database
-            session.flush()
-            # Store teacher object in our map for future reference
-            teacher_map[teacher.name] = teacher
-
-        # Step 3: Insert students, referrencing the appropriate teacher
-        for _, row in students_df.iterrows():
-            # Look up the teacher by name
-            teacher_name = row["teacher_name"]
-            teacher = teacher_map.get(teacher_name)
-
-            if teacher is None:
-                print(
-                    f"❌ WARNING: Teacher '{teacher_name}' not found, \n"
-                    f"    Skipping student '{row['name']}'"
-                )
-                continue
-
-            # Create the student linked to the teacher
-            student = Student(
-                name=row["name"],
-                grade=row["grade"],
-                teacher=teacher,  # This sets the relationship and teacher_id
+        # Step 1: Insert all teachers with a single bulk INSERT (one DBAPI
+        # executemany(), which pymysql already batches into multi-row INSERTs)
+        session.execute(insert(Teacher), teachers_df.to_dict(orient="records"))
+
+        # Step 2: Read back the ids assigned by the database, as a Series indexed
+        # by teacher name
+        teacher_ids = pd.DataFrame(
+            session.execute(
+                select(Teacher.name, Teacher.id).order_by(Teacher.id)
+            ).all(),
+            columns=["name", "id"],
+        ).set_index("name")["id"]
+        # Teacher names are not unique: like a dict, keep the last teacher of each name
+        teacher_ids = teacher_ids[~teacher_ids.index.duplicated(keep="last")]
+
+        # Step 3: Resolve each student's teacher_id with a single vectorized lookup
+        students_df = students_df.assign(
+            teacher_id=students_df["teacher_name"].map(teacher_ids)
+        )
+
+        missing = students_df["teacher_id"].isna()
+        for name, teacher_name in students_df.loc[
+            missing, ["name", "teacher_name"]
+        ].itertuples(index=False, name=None):
+            print(
+                f"❌ WARNING: Teacher '{teacher_name}' not found, \n"
+                f"    Skipping student '{name}'"
             )
-            session.add(student)
 
-        # Commit all changes
-        session.commit()
+        students_df = (
+            students_df[~missing]
+            .drop(columns=["teacher_name"])
+            .astype({"teacher_id": int})
+        )
+
+        # Step 4: Load the students straight from the DataFrame, bypassing the ORM:
+        # each chunk of 10 000 rows goes to a single DBAPI executemany() call,
+        # over the session's connection so they stay in the same transaction
+        students_df.to_sql(
+            Student.__tablename__,
+            session.connection(),
+            if_exists="append",
+            index=False,
+            method=_fast_insert,
+            chunksize=10_000,
+        )
+
         print("✅ Successfully imported teachers and students from DataFrames.")
 
 
-def verify_import(engine) -> None:
+def verify_import(session: Session) -> None:
     """Query the database to verify the import worked correctly."""
 
-    with Session(engine) as session:
-        # Count teachers and students
-        teacher_count = session.query(Teacher).count()
-        student_count = session.query(Student).count()
-
-        print(
-            "\nDatabase contains:\n"
-            f"  - {teacher_count} teachers,\n"
-            f"  - {student_count} students."
+    # Count teachers and students in a single query
+    teacher_count, student_count = session.execute(
+        select(
+            select(func.count()).select_from(Teacher).scalar_subquery(),
+            select(func.count()).select_from(Student).scalar_subquery(),
         )
+    ).one()
 
-        # Show each teacher and their students
-        teachers = session.execute(select(Teacher)).scalars().all()
+    print(
+        "\nDatabase contains:\n"
+        f"  - {teacher_count} teachers,\n"
+        f"  - {student_count} students."
+    )
+
+    # Show each teacher and their students
+    # (students are loaded for all teachers at once, not one query per teacher)
+    teachers = (
+        session.execute(select(Teacher).options(selectinload(Teacher.students)))
+        .scalars()
+        .all()
+    )
 
-        for teacher in teachers:
-            print(f"\nTeacher: {teacher.name} (Subject: {teacher.subject})")
-            print("👇 Students:")
-            for student in teacher.students:
-                print(f"    - {student.name}: Grade {student.grade}")
+    # (one print() per teacher, rather than one per line)
+    for teacher in teachers:
+        lines = [
+            f"\nTeacher: {teacher.name} (Subject: {teacher.subject})",
+            "👇 Students:",
+        ]
+        for student in teacher.students:
+            lines.append(f"    - {student.name}: Grade {student.grade}")
+        print("\n".join(lines))
 
 
 # 🔁 Create database if not exists
@@ -172,10 +210,12 @@ def create_database_if_not_exists(engine) -> None:
     db_name = engine.url.database
 
     # Create a connection without specifying a database
+    # (not pooled: it is used for a single statement, then closed)
     base_engine = create_engine(
         f"{engine.url.drivername}://{engine.url.username}:"
         f"{engine.url.password}@{engine.url.host}",
         echo=False,
+        poolclass=NullPool,
     )
 
     # Create database if it doesn't exsit
@@ -183,6 +223,8 @@ def create_database_if_not_exists(engine) -> None:
         conn.execute(text(f"CREATE DATABASE IF NOT EXISTS {db_name}"))
         print(f"Ensured database '{db_name}' exists.")
 
+    base_engine.dispose()
+
 
 def main():
     # Create sample DataFrame
@@ -199,13 +241,14 @@ def main():
         f"mysql+pymysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@"
         f"{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}",
         # Logging capabilities
-        echo=os.getenv("DB_ECHO", True) in ("true", "1", "t"),
+        echo=os.getenv("DB_ECHO", "false") in ("true", "1", "t"),
         # Number of connections to keep open
         pool_size=int(os.getenv("DB_POOL_SIZE", 5)),
         # Number of additional connections to temporarily establish during high load periods
         max_overflow=int(os.getenv("DB_MAX_OVERFLOW", 10)),
-        # Verify connections before use
-        pool_pre_ping=True,
+        # Verify connections before use (one extra round-trip per checkout:
+        # worth it for long-lived services, not for a short script like this one)
+        pool_pre_ping=os.getenv("DB_POOL_PRE_PING", "false") in ("true", "1", "t"),
         # Recycle connections after one hour
         pool_recycle=int(os.getenv("DB_POOL_RECYCLE", 3_600)),
     )
@@ -213,14 +256,17 @@ def main():
     # Create database if it doesn't exist
     create_database_if_not_exists(engine)
 
-    # Create all tables in the database
-    Base.metadata.create_all(engine)
+    # Create all tables in the database, on the first run only
+    if not inspect(engine).has_table("teachers"):
+        Base.metadata.create_all(engine, checkfirst=False)
 
-    # Populate database from DataFrames
-    populate_from_dataframes(engine, teachers_df, students_df)
+    # Populate and verify the database within a single session
+    with Session(engine) as session:
+        # Populate database from DataFrames
+        populate_from_dataframes(session, teachers_df, students_df)
 
-    # Verify the import
-    verify_import(engine)
+        # Verify the import
+        verify_import(session)
 
 
 if __name__ == "__main__":
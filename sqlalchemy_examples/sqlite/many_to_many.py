@@ -1,9 +1,18 @@
+import os
 from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy import ForeignKey, select
+from sqlalchemy import ForeignKey, event, insert, select
 from sqlalchemy.engine import create_engine
-from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column, relationship
+from sqlalchemy.orm import (
+    DeclarativeBase,
+    Mapped,
+    Session,
+    mapped_column,
+    relationship,
+    selectinload,
+)
+from sqlalchemy.pool import StaticPool
 
 
 # Base class for our models
@@ -16,7 +25,12 @@ class StudentCourseLink(Base):
     __tablename__ = "student_course_links"
 
     student_id: Mapped[int] = mapped_column(ForeignKey("students.id"), primary_key=True)
-    course_id: Mapped[int] = mapped_column(ForeignKey("courses.id"), primary_key=True)
+    # student_id leads the composite primary key, so lookups by student already
+    # use its index; lookups by course need one of their own
+    course_id: Mapped[int] = mapped_column(
+        ForeignKey("courses.id"), primary_key=True, index=True
+    )
+    # Only applied to link objects: the bulk INSERT in main() binds its own date
     enrollment_date: Mapped[datetime] = mapped_column(default=datetime.now)
 
     # Relationships to both sides
@@ -39,12 +53,15 @@ class Student(Base):
     course_links: Mapped[List[StudentCourseLink]] = relationship(
         back_populates="student",  # ⚠️ Corresponding relationship name
         cascade="all, delete-orphan",
+        lazy="selectin",
     )
 
-    # Convenience property to access courses directly
-    @property
-    def courses(self) -> List["Course"]:
-        return [link.course for link in self.course_links]
+    # Read-only shortcut to the courses, straight through the link table
+    # (enrollments are still written through the link objects); loaded on
+    # access only, so that loading a student doesn't also fetch its links twice
+    courses: Mapped[List["Course"]] = relationship(
+        secondary="student_course_links", viewonly=True
+    )
 
     def __repr__(self) -> str:
         return f"Student(id={self.id}, name={self.name}, email={self.email})"
@@ -55,90 +72,109 @@ class Course(Base):
     __tablename__ = "courses"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    title: Mapped[str] = mapped_column()
+    title: Mapped[str] = mapped_column(index=True)
     description: Mapped[Optional[str]] = mapped_column(nullable=True)
 
     # Relationship to association table
     student_links: Mapped[List[StudentCourseLink]] = relationship(
-        back_populates="course", cascade="all, delete-orphan"
+        back_populates="course", cascade="all, delete-orphan", lazy="selectin"
     )
 
-    # Convenience property to access students directly
-    @property
-    def students(self) -> List["Student"]:
-        return [link.student for link in self.student_links]
+    # Read-only shortcut to the students, straight through the link table
+    # (enrollments are still written through the link objects); loaded on
+    # access only, so that loading a course doesn't also fetch its links twice
+    students: Mapped[List["Student"]] = relationship(
+        secondary="student_course_links", viewonly=True
+    )
 
     def __repr__(self) -> str:
         return f"Course(id={self.id}, title={self.title})"
 
 
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Use write-ahead logging and fewer fsyncs on every new SQLite connection."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
 def main():
-    # Create SQLite database engine
-    engine = create_engine("sqlite:///university.db", echo=True)
+    # Create SQLite database engine (set DB_ECHO=1 to log the emitted SQL)
+    engine = create_engine(
+        "sqlite:///university.db",
+        echo=os.getenv("DB_ECHO", "false") in ("true", "1", "t"),
+        # Single-threaded script: every session reuses one cached connection
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    event.listen(engine, "connect", set_sqlite_pragmas)
 
     # Create all tables in the database
     Base.metadata.create_all(engine)
 
-    # Create a session to interact with the database
-    with Session(engine) as session:
+    # Create a session to interact with the database, inside a single transaction
+    # that is committed once, at the end of the block
+    with Session(engine) as session, session.begin():
         # Check if we already have data
-        result = session.execute(select(Course)).first()
+        result = session.execute(select(Course.id)).first()
         if result is None:
-            # Create courses
-            python_course = Course(
-                title="Python Programming",
-                description="Learn Python from basics to advanced concepts.",
-            )
-
-            data_science_course = Course(
-                title="Data Science Fundamentals",
-                description="Introduction to data analysis and visualization.",
-            )
-
-            ml_course = Course(
-                title="Machine Learning",
-                description="Algorithms and techniques for predictive modeling.",
-            )
-
-            # Create students
-            alice = Student(name="Alice Smith", email="alice@example.com")
-            bob = Student(name="Bob Johnson", email="bob@example.com")
-            charlie = Student(name="Charlie Brown", email="charlie@example.com")
-
-            # Create enrollments (many-to-many links)
-            # Alice takes Python and Data Science
-            alice_python = StudentCourseLink(student=alice, course=python_course)
-            alice_ds = StudentCourseLink(student=alice, course=data_science_course)
-
-            # Bob takes all three courses
-            bob_python = StudentCourseLink(student=bob, course=python_course)
-            bob_ds = StudentCourseLink(student=bob, course=data_science_course)
-            bob_ml = StudentCourseLink(student=bob, course=ml_course)
-
-            # Charlie takes Machine Learning only
-            charlie_ml = StudentCourseLink(student=charlie, course=ml_course)
-
-            # Add everything to the session
-            session.add_all(
+            # Insert the courses and the students, with one bulk INSERT each
+            # rather than one ORM object per row
+            courses = [
+                {
+                    "title": "Python Programming",
+                    "description": "Learn Python from basics to advanced concepts.",
+                },
+                {
+                    "title": "Data Science Fundamentals",
+                    "description": "Introduction to data analysis and visualization.",
+                },
+                {
+                    "title": "Machine Learning",
+                    "description": "Algorithms and techniques for predictive modeling.",
+                },
+            ]
+            students = [
+                {"name": "Alice Smith", "email": "alice@example.com"},
+                {"name": "Bob Johnson", "email": "bob@example.com"},
+                {"name": "Charlie Brown", "email": "charlie@example.com"},
+            ]
+            session.execute(insert(Course), courses)
+            session.execute(insert(Student), students)
+
+            # Read back the ids assigned by the database, keyed by natural key
+            course_ids = dict(session.execute(select(Course.title, Course.id)).all())
+            student_ids = dict(session.execute(select(Student.email, Student.id)).all())
+
+            # Enrollments (many-to-many links), as (student email, course title) pairs
+            enrollments = [
+                # Alice takes Python and Data Science
+                ("alice@example.com", "Python Programming"),
+                ("alice@example.com", "Data Science Fundamentals"),
+                # Bob takes all three courses
+                ("bob@example.com", "Python Programming"),
+                ("bob@example.com", "Data Science Fundamentals"),
+                ("bob@example.com", "Machine Learning"),
+                # Charlie takes Machine Learning only
+                ("charlie@example.com", "Machine Learning"),
+            ]
+
+            # Insert them straight from the ids, with a single bulk INSERT rather
+            # than one link object per enrollment, all dated with one timestamp
+            enrollment_date = datetime.now()
+            session.execute(
+                insert(StudentCourseLink),
                 [
-                    python_course,
-                    data_science_course,
-                    ml_course,
-                    alice,
-                    bob,
-                    charlie,
-                    alice_python,
-                    alice_ds,
-                    bob_python,
-                    bob_ds,
-                    bob_ml,
-                    charlie_ml,
-                ]
+                    {
+                        "student_id": student_ids[email],
+                        "course_id": course_ids[title],
+                        "enrollment_date": enrollment_date,
+                    }
+                    for email, title in enrollments
+                ],
             )
 
-            # Commit the changes
-            session.commit()
-
         # Query and demonstrate the relationship
 
         # 1️⃣ Get all courses
@@ -161,12 +197,19 @@ def main():
         # 3️⃣ Get a specific student and their courses
         print("\n3️⃣=== Bob and his courses ===")
         bob = session.execute(
-            select(Student).where(Student.name == "Bob Johnson")
+            select(Student)
+            .where(Student.name == "Bob Johnson")
+            .options(
+                selectinload(Student.course_links).selectinload(
+                    StudentCourseLink.course
+                )
+            )
         ).scalar_one()
         print(f"Student: {bob.name} ({bob.email})")
         print("👇 Courses enrolled:")
-        for course in bob.courses:
-            print(f"    - {course.title}")
+        # (read through the links loaded above, which section 4 needs anyway)
+        for link in bob.course_links:
+            print(f"    - {link.course.title}")
 
         # 4️⃣ We can also access the enrollment date through the association object
         print("\n4️⃣=== Enrollment details ===")
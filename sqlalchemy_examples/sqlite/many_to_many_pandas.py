@@ -1,10 +1,19 @@
+import os
 from datetime import datetime
 from typing import List, Optional, Tuple
 
 import pandas as pd
-from sqlalchemy import ForeignKey, select
+from sqlalchemy import ForeignKey, Index, event, func, insert, inspect, select
 from sqlalchemy.engine import create_engine
-from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column, relationship
+from sqlalchemy.orm import (
+    DeclarativeBase,
+    Mapped,
+    Session,
+    mapped_column,
+    relationship,
+    selectinload,
+)
+from sqlalchemy.pool import StaticPool
 
 
 # Base class for models
@@ -17,7 +26,11 @@ class StudentCourseLink(Base):
     __tablename__ = "student_course_links"
 
     student_id: Mapped[int] = mapped_column(ForeignKey("students.id"), primary_key=True)
-    course_id: Mapped[int] = mapped_column(ForeignKey("courses.id"), primary_key=True)
+    # student_id leads the composite primary key, so lookups by student already
+    # use its index; lookups by course need one of their own
+    course_id: Mapped[int] = mapped_column(
+        ForeignKey("courses.id"), primary_key=True, index=True
+    )
     enrollment_date: Mapped[datetime] = mapped_column(default=datetime.now)
 
     # Relationships to both sides
@@ -38,13 +51,15 @@ class Student(Base):
 
     # Relationship to the association table
     course_links: Mapped[List[StudentCourseLink]] = relationship(
-        back_populates="student", cascade="all, delete-orphan"
+        back_populates="student", cascade="all, delete-orphan", lazy="selectin"
     )
 
-    # Convenience property to access courses directly
-    @property
-    def courses(self) -> List["Course"]:
-        return [link.course for link in self.course_links]
+    # Read-only shortcut to the courses, straight through the link table
+    # (enrollments are still written through the link objects); loaded on
+    # access only, so that loading a student doesn't also fetch its links twice
+    courses: Mapped[List["Course"]] = relationship(
+        secondary="student_course_links", viewonly=True
+    )
 
     def __repr__(self) -> str:
         return f"Student(id={self.id}, name={self.name}, email={self.email})"
@@ -60,18 +75,25 @@ class Course(Base):
 
     # Relationship to the association table
     student_links: Mapped[List[StudentCourseLink]] = relationship(
-        back_populates="course", cascade="all, delete-orphan"
+        back_populates="course", cascade="all, delete-orphan", lazy="selectin"
     )
 
-    # Convenience property to access students directly
-    @property
-    def students(self) -> List[Student]:
-        return [link.student for link in self.student_links]
+    # Read-only shortcut to the students, straight through the link table
+    # (enrollments are still written through the link objects); loaded on
+    # access only, so that loading a course doesn't also fetch its links twice
+    students: Mapped[List[Student]] = relationship(
+        secondary="student_course_links", viewonly=True
+    )
 
     def __repr__(self) -> str:
         return f"Course(id={self.id}, title={self.title})"
 
 
+# Index on the courses' natural key, declared on its own so that the import can
+# drop it while loading the rows and build it once, afterwards
+course_title_index = Index("ix_courses_title", Course.title)
+
+
 def create_sample_dataframes() -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     """Create sample pandas DataFrames for students, courses, and enrollments."""
 
@@ -166,57 +188,66 @@ def populate_from_dataframes(
 ) -> None:
     """Populate the database from pandas DataFrames."""
 
-    with Session(engine) as session:
+    # Run the whole import in a single transaction, committed once at the end
+    with Session(engine) as session, session.begin():
         # Check if we already have data
-        result = session.execute(select(Course)).first()
+        result = session.execute(select(Course.id)).first()
         if result:
             print("☝️ Database already contains data. Skipping import")
             return
 
-        # Step 1: Create mappings to track objects by their natural keys
-        student_map = {}
-        course_map = {}
-
-        # Step 2: Insert students and build the student mapping
-        for _, row in students_df.iterrows():
-            student = Student(name=row["name"], email=row["email"])
-            session.add(student)
-            session.flush()  # Get the database assigned id
-            student_map[student.email] = student
-
-        # Step 3: Insert courses and build the course mapping
-        for _, row in courses_df.iterrows():
-            course = Course(title=row["title"], description=row["description"])
-            session.add(course)
-            session.flush()
-            course_map[course.title] = course
-
-        # Step 4: Create the enrollments (many-to-many links)
-        for _, row in enrollments_df.iterrows():
-            student_email = row["student_email"]
-            course_title = row["course_title"]
-            enrollment_date = datetime.strptime(row["enrollment_date"], "%Y-%m-%d")
-
-            # Look up the student and course by their natural keys
-            student = student_map.get(student_email)
-            course = course_map.get(course_title)
-
-            # ⚠️ Skip if either is not found
-            if student is None:
-                print(f"❌ Warning: Student with email '{student_email}' not found")
-                continue
-            if course is None:
-                print(f"❌ Warning: Course with title '{course_title}' not found")
-                continue
-
-            # Create the link
-            link = StudentCourseLink(
-                student=student, course=course, enrollment_date=enrollment_date
+        # Step 1: Insert all students and all courses, with one bulk INSERT each
+        # (the course title index, if any, is dropped meanwhile, then rebuilt once)
+        course_title_index.drop(session.connection(), checkfirst=True)
+        session.execute(insert(Student), students_df.to_dict(orient="records"))
+        session.execute(insert(Course), courses_df.to_dict(orient="records"))
+        course_title_index.create(session.connection(), checkfirst=True)
+
+        # Step 2: Read back the ids assigned by the database, as Series indexed
+        # by the natural keys the enrollments refer to
+        student_ids = pd.DataFrame(
+            session.execute(select(Student.email, Student.id)).all(),
+            columns=["email", "id"],
+        ).set_index("email")["id"]
+        course_ids = pd.DataFrame(
+            session.execute(select(Course.title, Course.id).order_by(Course.id)).all(),
+            columns=["title", "id"],
+        ).set_index("title")["id"]
+        # Course titles are not unique: like a dict, keep the last course of each title
+        course_ids = course_ids[~course_ids.index.duplicated(keep="last")]
+
+        # Step 3: Resolve each enrollment's student_id and course_id with
+        # vectorized lookups
+        links_df = enrollments_df.assign(
+            student_id=enrollments_df["student_email"].map(student_ids),
+            course_id=enrollments_df["course_title"].map(course_ids),
+        )
+
+        # ⚠️ Skip the enrollments whose student or course is not found
+        missing_student = links_df["student_id"].isna()
+        missing_course = links_df["course_id"].isna()
+        for student_email in links_df.loc[missing_student, "student_email"]:
+            print(f"❌ Warning: Student with email '{student_email}' not found")
+        for course_title in links_df.loc[
+            ~missing_student & missing_course, "course_title"
+        ]:
+            print(f"❌ Warning: Course with title '{course_title}' not found")
+
+        # Parse the whole enrollment_date column at once
+        links_df = (
+            links_df[~(missing_student | missing_course)]
+            .drop(columns=["student_email", "course_title"])
+            .astype({"student_id": int, "course_id": int})
+            .assign(
+                enrollment_date=lambda df: pd.to_datetime(
+                    df["enrollment_date"], format="%Y-%m-%d", cache=True
+                )
             )
-            session.add(link)
+        )
+
+        # Step 4: Insert all the enrollments (many-to-many links) the same way
+        session.execute(insert(StudentCourseLink), links_df.to_dict(orient="records"))
 
-        # Commit all changes
-        session.commit()
         print(
             "✅ Successfully imported students, courses and enrollments from DataFrames"
         )
@@ -226,10 +257,14 @@ def verify_import(engine) -> None:
     """Query the database to verify the import worked correctly."""
 
     with Session(engine) as session:
-        # 1️⃣ Count records in each table
-        student_count = session.query(Student).count()
-        course_count = session.query(Course).count()
-        enrollment_count = session.query(StudentCourseLink).count()
+        # 1️⃣ Count records in each table with a single query
+        student_count, course_count, enrollment_count = session.execute(
+            select(
+                select(func.count()).select_from(Student).scalar_subquery(),
+                select(func.count()).select_from(Course).scalar_subquery(),
+                select(func.count()).select_from(StudentCourseLink).scalar_subquery(),
+            )
+        ).one()
 
         print("\n1️⃣ Database contains:")
         print(f"- {student_count} students")
@@ -238,29 +273,63 @@ def verify_import(engine) -> None:
 
         # 2️⃣ Show courses for each student
         print("\n2️⃣=== Students and Their Courses ===")
-        students = session.execute(select(Student)).scalars().all()
+        # (students are streamed in batches of 200, each batch loading its links
+        # and their courses in one query per level)
+        students = session.execute(
+            select(Student)
+            .options(
+                selectinload(Student.course_links).selectinload(
+                    StudentCourseLink.course
+                )
+            )
+            .execution_options(yield_per=200)
+        ).scalars()
 
+        # (one print() per student, rather than one per line)
         for student in students:
-            print(f"\nStudent: {student.name} ({student.email})")
-            print("\n👇 Courses enrolled")
+            lines = [
+                f"\nStudent: {student.name} ({student.email})",
+                "\n👇 Courses enrolled",
+            ]
             for link in student.course_links:
-                print(
+                lines.append(
                     f"    - {link.course.title} "
                     f"(enrolled on {link.enrollment_date.strftime('%Y-%m-%d')})"
                 )
+            print("\n".join(lines))
 
         # 3️⃣ Show students for each course
         print("\n3️⃣=== Courses and Enrolled Students ===")
-        courses = session.execute(select(Course)).scalars().all()
+        courses = session.execute(
+            select(Course)
+            .options(
+                selectinload(Course.student_links).selectinload(
+                    StudentCourseLink.student
+                )
+            )
+            .execution_options(yield_per=200)
+        ).scalars()
 
         for course in courses:
-            print(f"\nCourse: {course.title}")
-            print("👇 Students enrolled:")
+            lines = [f"\nCourse: {course.title}", "👇 Students enrolled:"]
             for link in course.student_links:
-                print(
+                lines.append(
                     f"  - {link.student.name} "
                     f"(enrolled on {link.enrollment_date.strftime('%Y-%m-%d')})"
                 )
+            print("\n".join(lines))
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Tune every new SQLite connection for bulk loading."""
+    cursor = dbapi_connection.cursor()
+    # Write-ahead logging, with fewer fsyncs
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    # Keep temporary data in memory and allow a page cache of about 200 MB
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-200000")
+    cursor.close()
 
 
 def main() -> None:
@@ -277,11 +346,19 @@ def main() -> None:
     print("\nSample Enrollment Data:")
     print(enrollments_df.head())
 
-    # Create SQLite database engine
-    engine = create_engine("sqlite:///university_from_pandas.db", echo=True)
+    # Create SQLite database engine (set DB_ECHO=1 to log the emitted SQL)
+    engine = create_engine(
+        "sqlite:///university_from_pandas.db",
+        echo=os.getenv("DB_ECHO", "false") in ("true", "1", "t"),
+        # Single-threaded script: every session reuses one cached connection
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    event.listen(engine, "connect", set_sqlite_pragmas)
 
-    # Create all tables in the database
-    Base.metadata.create_all(engine)
+    # Create all tables in the database, on the first run only
+    if not inspect(engine).has_table("courses"):
+        Base.metadata.create_all(engine, checkfirst=False)
 
     # Populate database from DataFrames
     populate_from_dataframes(engine, students_df, courses_df, enrollments_df)
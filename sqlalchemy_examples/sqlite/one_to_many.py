@@ -1,9 +1,10 @@
-from typing import List, Optional
+import os
+from typing import List
 
-from sqlalchemy import ForeignKey, select
+from sqlalchemy import ForeignKey, event, select
 from sqlalchemy.engine import create_engine
-from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column, relationship
+from sqlalchemy.pool import StaticPool
 
 
 class Base(DeclarativeBase):
@@ -16,12 +17,12 @@ class Teacher(Base):
 
     # Fields
     id: Mapped[int] = mapped_column(primary_key=True)
-    name: Mapped[str] = mapped_column()
+    name: Mapped[str] = mapped_column(index=True)
     subject: Mapped[str] = mapped_column()
 
     # Relationship: one teacher has many students
     students: Mapped[List["Student"]] = relationship(
-        back_populates="teacher", cascade="all, delete-orphan"
+        back_populates="teacher", cascade="all, delete-orphan", lazy="selectin"
     )
 
     def __repr__(self) -> str:
@@ -37,25 +38,41 @@ class Student(Base):
     name: Mapped[str] = mapped_column()
     grade: Mapped[int] = mapped_column()
 
-    # Foreign Key
-    teacher_id: Mapped[int] = mapped_column(ForeignKey("teachers.id"))
+    # Foreign Key (indexed: SQLite does not index foreign keys on its own)
+    teacher_id: Mapped[int] = mapped_column(ForeignKey("teachers.id"), index=True)
 
     # Relationship: many students have one teacher
-    teacher: Mapped["Teacher"] = relationship(back_populates="students")
+    teacher: Mapped["Teacher"] = relationship(back_populates="students", lazy="joined")
 
     def __repr__(self) -> str:
         return f"Student(id={self.id}, name={self.name}, grade={self.grade})"
 
 
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Use write-ahead logging and fewer fsyncs on every new SQLite connection."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
 def main():
-    # Create SQLite database engine
-    engine = create_engine("sqlite:///school.db", echo=True)
+    # Create SQLite database engine (set DB_ECHO=1 to log the emitted SQL)
+    engine = create_engine(
+        "sqlite:///school.db",
+        echo=os.getenv("DB_ECHO", "false") in ("true", "1", "t"),
+        # Single-threaded script: every session reuses one cached connection
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    event.listen(engine, "connect", set_sqlite_pragmas)
 
     # Create all tables in the database
     Base.metadata.create_all(engine)
 
-    # Create a session to interact with the database
-    with Session(engine) as session:
+    # Create a session to interact with the database, inside a single transaction
+    # that is committed once, at the end of the block
+    with Session(engine) as session, session.begin():
         # Check if we already have data
         result = session.execute(select(Teacher)).first()
         if result is None:
@@ -70,9 +87,6 @@ def main():
             # Add the teacher to the session (students will be added automatically via cascade)
             session.add(math_teacher)
 
-            # Commit the changes
-            session.commit()
-
         # Query and demonstrate the relationship
 
         # 1️⃣ Get all teachers
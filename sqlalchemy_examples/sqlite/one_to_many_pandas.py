@@ -1,9 +1,18 @@
+import os
 from typing import List, Tuple
 
 import pandas as pd
-from sqlalchemy import ForeignKey, select
+from sqlalchemy import ForeignKey, Index, event, func, insert, inspect, select
 from sqlalchemy.engine import create_engine
-from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column, relationship
+from sqlalchemy.orm import (
+    DeclarativeBase,
+    Mapped,
+    Session,
+    mapped_column,
+    relationship,
+    selectinload,
+)
+from sqlalchemy.pool import StaticPool
 
 
 # Define our base class
@@ -21,13 +30,18 @@ class Teacher(Base):
 
     # Relationship: one teacher has many students
     students: Mapped[List["Student"]] = relationship(
-        back_populates="teacher", cascade="all, delete-orphan"
+        back_populates="teacher", cascade="all, delete-orphan", lazy="selectin"
     )
 
     def __repr__(self) -> str:
         return f"Teacher(id={self.id}, name={self.name}, subject={self.subject})"
 
 
+# Index on the teachers' natural key, declared on its own so that the import can
+# drop it while loading the rows and build it once, afterwards
+teacher_name_index = Index("ix_teachers_name", Teacher.name)
+
+
 # Define our Student model
 class Student(Base):
     __tablename__ = "students"
@@ -36,126 +50,168 @@ class Student(Base):
     name: Mapped[str] = mapped_column()
     grade: Mapped[int] = mapped_column()
 
-    # Foreign key to link to the teacher
-    teacher_id: Mapped[int] = mapped_column(ForeignKey("teachers.id"))
+    # Foreign key to link to the teacher (indexed: SQLite does not index FKs)
+    teacher_id: Mapped[int] = mapped_column(ForeignKey("teachers.id"), index=True)
 
     # Relationship: many students have one teacher
-    teacher: Mapped["Teacher"] = relationship(back_populates="students")
+    teacher: Mapped["Teacher"] = relationship(back_populates="students", lazy="joined")
 
     def __repr__(self) -> str:
         return f"Student(id={self.id}, name={self.name}, grade={self.grade})"
 
 
+# Sample data: one (name, subject) tuple per teacher
+TEACHERS = (
+    ("Ms. Johnson", "Mathematics"),
+    ("Mr. Smith", "History"),
+    ("Dr. Garcia", "Science"),
+)
+
+# Sample data: one (name, grade, teacher_name) tuple per student
+# Note: We include the teacher's name to link to teachers
+STUDENTS = (
+    ("Alice", 95, "Ms. Johnson"),  # Math students
+    ("Bob", 87, "Ms. Johnson"),
+    ("Charlie", 91, "Ms. Johnson"),
+    ("Diana", 82, "Mr. Smith"),  # History students
+    ("Edward", 88, "Mr. Smith"),
+    ("Fatima", 94, "Dr. Garcia"),  # Science students
+    ("George", 79, "Dr. Garcia"),
+    ("Hannah", 90, "Dr. Garcia"),
+)
+
+
 def create_sample_dataframe() -> Tuple[pd.DataFrame, pd.DataFrame]:
     """Create sample pandas DataFrames for teachers and students."""
 
-    # Create a DataFrame for teachers
-    teachers_data = {
-        "name": ["Ms. Johnson", "Mr. Smith", "Dr. Garcia"],
-        "subject": ["Mathematics", "History", "Science"],
-    }
-    teachers_df = pd.DataFrame(teachers_data)
-
-    # Create a DataFrame for students
-    # Note: We include a 'teacher_name' column to link to teachers
-    students_data = {
-        "name": [
-            "Alice",
-            "Bob",
-            "Charlie",
-            "Diana",
-            "Edward",
-            "Fatima",
-            "George",
-            "Hannah",
-        ],
-        "grade": [95, 87, 91, 82, 88, 94, 79, 90],
-        "teacher_name": [
-            "Ms. Johnson",
-            "Ms. Johnson",
-            "Ms. Johnson",  # Math students
-            "Mr. Smith",
-            "Mr. Smith",  # History students
-            "Dr. Garcia",
-            "Dr. Garcia",
-            "Dr. Garcia",  # Science students
-        ],
-    }
-    students_df = pd.DataFrame(students_data)
+    # Build each DataFrame with a single constructor call from the row tuples
+    teachers_df = pd.DataFrame(TEACHERS, columns=["name", "subject"])
+    students_df = pd.DataFrame(STUDENTS, columns=["name", "grade", "teacher_name"])
 
     return teachers_df, students_df
 
 
+def _fast_insert(table, conn, keys, data_iter) -> None:
+    """`DataFrame.to_sql()` insert method: one DBAPI executemany() per chunk."""
+    # The rows go to the driver as plain tuples, with no per-row SQLAlchemy
+    # processing
+    columns = ", ".join(keys)
+    placeholders = ", ".join(["?"] * len(keys))
+    cursor = conn.connection.cursor()
+    cursor.executemany(
+        f"INSERT INTO {table.name} ({columns}) VALUES ({placeholders})", data_iter
+    )
+    cursor.close()
+
+
 def populate_from_dataframes(
-    engine, teachers_df: pd.DataFrame, students_df: pd.DataFrame
+    session: Session, teachers_df: pd.DataFrame, students_df: pd.DataFrame
 ) -> None:
-    with Session(engine) as session:
+    with session.begin():
         # Check if we already have data
         result = session.execute(select(Teacher)).first()
         if result is not None:
             print("ℹ️ Database already contains data")
             return
 
-        # Step 1: Create a dictionary to map teacher names to teacher objects
-        teacher_map = {}
-
-        # Step 2: Insert teachers and build the mapping
-        for _, row in teachers_df.iterrows():
-            teacher = Teacher(name=row["name"], subject=row["subject"])
-            session.add(teacher)
-            # We need to flush to get the ID assigned by the database
-            session.flush()
-            # Store teacher object in our map for future reference
-            teacher_map[teacher.name] = teacher
-
-        # Step 3: Insert students, referrencing the appropriate teacher
-        for _, row in students_df.iterrows():
-            # Look up the teacher by name
-            teacher_name = row["teacher_name"]
-            teacher = teacher_map.get(teacher_name)
-
-            if teacher is None:
-                print(
-                    f"❌ WARNING: Teacher '{teacher_name}' not found, \n"
-                    f"    Skipping student '{row['name']}'"
-                )
-                continue
-
-            # Create the student linked to the teacher
-            student = Student(
-                name=row["name"],
-                grade=row["grade"],
-                teacher=teacher,  # This sets the relationship and teacher_id
+        # Step 1: Insert all teachers with a single bulk INSERT
+        # (their name index, if any, is dropped meanwhile, then rebuilt in one pass)
+        teacher_name_index.drop(session.connection(), checkfirst=True)
+        session.execute(insert(Teacher), teachers_df.to_dict(orient="records"))
+        teacher_name_index.create(session.connection(), checkfirst=True)
+
+        # Step 2: Read back the ids assigned by the database, as a Series indexed
+        # by teacher name
+        teacher_ids = pd.DataFrame(
+            session.execute(
+                select(Teacher.name, Teacher.id).order_by(Teacher.id)
+            ).all(),
+            columns=["name", "id"],
+        ).set_index("name")["id"]
+        # Teacher names are not unique: like a dict, keep the last teacher of each name
+        teacher_ids = teacher_ids[~teacher_ids.index.duplicated(keep="last")]
+
+        # Step 3: Resolve each student's teacher_id with a single vectorized lookup
+        students_df = students_df.assign(
+            teacher_id=students_df["teacher_name"].map(teacher_ids)
+        )
+
+        missing = students_df["teacher_id"].isna()
+        for name, teacher_name in students_df.loc[
+            missing, ["name", "teacher_name"]
+        ].itertuples(index=False, name=None):
+            print(
+                f"❌ WARNING: Teacher '{teacher_name}' not found, \n"
+                f"    Skipping student '{name}'"
             )
-            session.add(student)
 
-        # Commit all changes
-        session.commit()
+        students_df = (
+            students_df[~missing]
+            .drop(columns=["teacher_name"])
+            .astype({"teacher_id": int})
+        )
+
+        # Step 4: Load the students straight from the DataFrame, bypassing the ORM:
+        # each chunk of 10 000 rows goes to a single DBAPI executemany() call,
+        # over the session's connection so they stay in the same transaction
+        students_df.to_sql(
+            Student.__tablename__,
+            session.connection(),
+            if_exists="append",
+            index=False,
+            method=_fast_insert,
+            chunksize=10_000,
+        )
+
         print("✅ Successfully imported teachers and students from DataFrames.")
 
 
-def verify_import(engine) -> None:
+def verify_import(session: Session) -> None:
     """Query the database to verify the import worked correctly."""
 
-    with Session(engine) as session:
-        # Count teachers and students
-        teacher_count = session.query(Teacher).count()
-        student_count = session.query(Student).count()
-
-        print(
-            "\nDatabase contains:\n"
-            f"  - {teacher_count} teachers,\n"
-            f"  - {student_count} students."
+    # Count teachers and students in a single query
+    teacher_count, student_count = session.execute(
+        select(
+            select(func.count()).select_from(Teacher).scalar_subquery(),
+            select(func.count()).select_from(Student).scalar_subquery(),
         )
+    ).one()
 
-        # Show each teacher and their students
-        teachers = session.execute(select(Teacher)).scalars().all()
+    print(
+        "\nDatabase contains:\n"
+        f"  - {teacher_count} teachers,\n"
+        f"  - {student_count} students."
+    )
 
-        for teacher in teachers:
-            print(f"\nTeacher: {teacher.name} (Subject: {teacher.subject})")
-            print("👇 Students:")
-            for student in teacher.students:
-                print(f"    - {student.name}: Grade {student.grade}")
+    # Show each teacher and their students, streaming teachers in batches of 200
+    # (each batch loads its students in one query, not one query per teacher)
+    teachers = session.execute(
+        select(Teacher)
+        .options(selectinload(Teacher.students))
+        .execution_options(yield_per=200)
+    ).scalars()
+
+    # (one print() per teacher, rather than one per line)
+    for teacher in teachers:
+        lines = [
+            f"\nTeacher: {teacher.name} (Subject: {teacher.subject})",
+            "👇 Students:",
+        ]
+        for student in teacher.students:
+            lines.append(f"    - {student.name}: Grade {student.grade}")
+        print("\n".join(lines))
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Tune every new SQLite connection for bulk loading."""
+    cursor = dbapi_connection.cursor()
+    # Write-ahead logging, with fewer fsyncs
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    # Keep temporary data in memory and allow a page cache of about 200 MB
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-200000")
+    cursor.close()
 
 
 def main():
@@ -168,17 +224,27 @@ def main():
     print("\nSample Student Data:")
     print(students_df.head())
 
-    # Create SQLite database engine
-    engine = create_engine("sqlite:///school_from_pandas.db", echo=True)
+    # Create SQLite database engine (set DB_ECHO=1 to log the emitted SQL)
+    engine = create_engine(
+        "sqlite:///school_from_pandas.db",
+        echo=os.getenv("DB_ECHO", "false") in ("true", "1", "t"),
+        # Single-threaded script: every session reuses one cached connection
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    event.listen(engine, "connect", set_sqlite_pragmas)
 
-    # Create all tables in the database
-    Base.metadata.create_all(engine)
+    # Create all tables in the database, on the first run only
+    if not inspect(engine).has_table("teachers"):
+        Base.metadata.create_all(engine, checkfirst=False)
 
-    # Populate database from DataFrames
-    populate_from_dataframes(engine, teachers_df, students_df)
+    # Populate and verify the database within a single session
+    with Session(engine) as session:
+        # Populate database from DataFrames
+        populate_from_dataframes(session, teachers_df, students_df)
 
-    # Verify the import
-    verify_import(engine)
+        # Verify the import
+        verify_import(session)
 
 
 if __name__ == "__main__":
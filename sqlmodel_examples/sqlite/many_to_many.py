@@ -1,7 +1,19 @@
+import os
 from datetime import datetime
 from typing import List, Optional
 
-from sqlmodel import Field, Relationship, Session, SQLModel, create_engine, select
+from sqlalchemy import event
+from sqlalchemy.orm import selectinload
+from sqlalchemy.pool import StaticPool
+from sqlmodel import (
+    Field,
+    Relationship,
+    Session,
+    SQLModel,
+    create_engine,
+    insert,
+    select,
+)
 
 
 # Association model for the many-to-many relationship
@@ -9,7 +21,10 @@ class StudentCourseLink(SQLModel, table=True):
     __tablename__ = "student_course_links"
 
     student_id: int = Field(foreign_key="students.id", primary_key=True)
-    course_id: int = Field(foreign_key="courses.id", primary_key=True)
+    # student_id leads the composite primary key, so lookups by student already
+    # use its index; lookups by course need one of their own
+    course_id: int = Field(foreign_key="courses.id", primary_key=True, index=True)
+    # Only applied to link objects: the bulk INSERT in main() binds its own date
     enrollment_date: datetime = Field(default_factory=datetime.now)
 
     # Define relationships
@@ -31,10 +46,11 @@ class Student(SQLModel, table=True):
     # Relationship to the link table
     course_links: List[StudentCourseLink] = Relationship(back_populates="student")
 
-    # Convenience property to access courses directly
-    @property
-    def courses(self) -> List["Course"]:
-        return [link.course for link in self.course_links]
+    # Read-only shortcut to the courses, straight through the link table
+    # (enrollments are still written through the link objects)
+    courses: List["Course"] = Relationship(
+        link_model=StudentCourseLink, sa_relationship_kwargs={"viewonly": True}
+    )
 
     def __repr__(self) -> str:
         return f"Student(id={self.id}, name={self.name}, email={self.email})"
@@ -45,92 +61,106 @@ class Course(SQLModel, table=True):
     __tablename__ = "courses"
 
     id: Optional[int] = Field(default=None, primary_key=True)
-    title: str
+    title: str = Field(index=True)
     description: Optional[str] = None
 
     # Relationship to the link table
     student_links: List[StudentCourseLink] = Relationship(back_populates="course")
 
-    # Convenience property to access students directly
-    @property
-    def students(self) -> List[Student]:
-        return [link.student for link in self.student_links]
+    # Read-only shortcut to the students, straight through the link table
+    # (enrollments are still written through the link objects)
+    students: List[Student] = Relationship(
+        link_model=StudentCourseLink, sa_relationship_kwargs={"viewonly": True}
+    )
 
     def __repr__(self) -> str:
         return f"Course(id={self.id}, title={self.title})"
 
 
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Use write-ahead logging and fewer fsyncs on every new SQLite connection."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
 def main():
-    # Create SQLite database engine
-    engine = create_engine("sqlite:///university_sqlmodel.db", echo=True)
+    # Create SQLite database engine (set DB_ECHO=1 to log the emitted SQL)
+    engine = create_engine(
+        "sqlite:///university_sqlmodel.db",
+        echo=os.getenv("DB_ECHO", "false") in ("true", "1", "t"),
+        # Single-threaded script: every session reuses one cached connection
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    event.listen(engine, "connect", set_sqlite_pragmas)
 
     # Create all tables in the database
     SQLModel.metadata.create_all(engine)
 
-    # Create a session to interact with the database
-    with Session(engine) as session:
+    # Create a session to interact with the database, inside a single transaction
+    # that is committed once, at the end of the block
+    with Session(engine) as session, session.begin():
         # Check if we already have data
         result = session.exec(select(Course)).first()
         if result is None:
-            # Create courses
-            python_course = Course(
-                title="Python Programming",
-                description="Learn Python from basics to advanced concepts.",
-            )
-
-            data_science_course = Course(
-                title="Data Science Fundamentals",
-                description="Introduction to data analysis and visualization.",
+            # Insert the courses and the students, with one bulk INSERT each
+            # rather than one ORM object per row
+            courses = [
+                {
+                    "title": "Python Programming",
+                    "description": "Learn Python from basics to advanced concepts.",
+                },
+                {
+                    "title": "Data Science Fundamentals",
+                    "description": "Introduction to data analysis and visualization.",
+                },
+                {
+                    "title": "Machine Learning",
+                    "description": "Algorithms and techniques for predictive modeling.",
+                },
+            ]
+            students = [
+                {"name": "Alice Smith", "email": "alice@example.com"},
+                {"name": "Bob Johnson", "email": "bob@example.com"},
+                {"name": "Charlie Brown", "email": "charlie@example.com"},
+            ]
+            session.exec(insert(Course), params=courses)
+            session.exec(insert(Student), params=students)
+
+            # Read back the ids assigned by the database, keyed by natural key
+            course_ids = dict(session.exec(select(Course.title, Course.id)).all())
+            student_ids = dict(session.exec(select(Student.email, Student.id)).all())
+
+            # Enrollments (many-to-many links), as (student email, course title) pairs
+            enrollments = [
+                # Alice takes Python and Data Science
+                ("alice@example.com", "Python Programming"),
+                ("alice@example.com", "Data Science Fundamentals"),
+                # Bob takes all three courses
+                ("bob@example.com", "Python Programming"),
+                ("bob@example.com", "Data Science Fundamentals"),
+                ("bob@example.com", "Machine Learning"),
+                # Charlie takes Machine Learning only
+                ("charlie@example.com", "Machine Learning"),
+            ]
+
+            # Insert them straight from the ids, with a single bulk INSERT rather
+            # than one link object per enrollment, all dated with one timestamp
+            enrollment_date = datetime.now()
+            session.exec(
+                insert(StudentCourseLink),
+                params=[
+                    {
+                        "student_id": student_ids[email],
+                        "course_id": course_ids[title],
+                        "enrollment_date": enrollment_date,
+                    }
+                    for email, title in enrollments
+                ],
             )
 
-            ml_course = Course(
-                title="Machine Learning",
-                description="Algorithms and techniques for predictive modeling.",
-            )
-
-            # Create students
-            alice = Student(name="Alice Smith", email="alice@example.com")
-            bob = Student(name="Bob Johnson", email="bob@example.com")
-            charlie = Student(name="Charlie Brown", email="charlie@example.com")
-
-            # Create enrollments (many-to-many links)
-            # Alice takes Python and Data Science
-            alice_python = StudentCourseLink(student=alice, course=python_course)
-            alice_ds = StudentCourseLink(student=alice, course=data_science_course)
-
-            # Bob takes all three courses
-            bob_python = StudentCourseLink(student=bob, course=python_course)
-            bob_ds = StudentCourseLink(student=bob, course=data_science_course)
-            bob_ml = StudentCourseLink(student=bob, course=ml_course)
-
-            # Charlie takes Machine Learning only
-            charlie_ml = StudentCourseLink(student=charlie, course=ml_course)
-
-            # Add everything to the session
-            session.add_all(
-                [
-                    python_course,
-                    data_science_course,
-                    ml_course,
-                    alice,
-                    bob,
-                    charlie,
-                    alice_python,
-                    alice_ds,
-                    bob_python,
-                    bob_ds,
-                    bob_ml,
-                    charlie_ml,
-                ]
-            )
-
-            # Commit the changes
-            session.commit()
-
-            # Refresh objects to ensure relationships are loaded
-            session.refresh(python_course)
-            session.refresh(bob)
-
         # Query and demonstrate the relationship
 
         # 1️⃣ Get all courses
@@ -142,7 +172,9 @@ def main():
         # 2️⃣ Get a specific course and its students
         print("\n2️⃣=== Python Course and its students ===")
         python_course = session.exec(
-            select(Course).where(Course.title == "Python Programming")
+            select(Course)
+            .where(Course.title == "Python Programming")
+            .options(selectinload(Course.students))
         ).one()
         print(f"Course: {python_course.title}")
         print(f"Description: {python_course.description}")
@@ -152,11 +184,20 @@ def main():
 
         # 3️⃣ Get a specific student and their courses
         print("\n3️⃣=== Bob and his courses ===")
-        bob = session.exec(select(Student).where(Student.name == "Bob Johnson")).one()
+        bob = session.exec(
+            select(Student)
+            .where(Student.name == "Bob Johnson")
+            .options(
+                selectinload(Student.course_links).selectinload(
+                    StudentCourseLink.course
+                )
+            )
+        ).one()
         print(f"Student: {bob.name} ({bob.email})")
         print("👇 Courses enrolled:")
-        for course in bob.courses:
-            print(f"    - {course.title}")
+        # (read through the links loaded above, which section 4 needs anyway)
+        for link in bob.course_links:
+            print(f"    - {link.course.title}")
 
         # 4️⃣ We can also access the enrollment date through the association object
         print("\n4️⃣=== Enrollment details ===")
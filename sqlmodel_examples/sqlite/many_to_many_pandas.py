@@ -1,8 +1,23 @@
+import os
 from datetime import datetime
 from typing import List, Optional, Tuple
 
 import pandas as pd
-from sqlmodel import Field, Relationship, Session, SQLModel, create_engine, select
+from sqlalchemy import event
+from sqlalchemy.orm import selectinload
+from sqlalchemy.pool import StaticPool
+from sqlmodel import (
+    Field,
+    Index,
+    Relationship,
+    Session,
+    SQLModel,
+    create_engine,
+    func,
+    insert,
+    inspect,
+    select,
+)
 
 
 # Association table for the many-to-many relationships
@@ -10,8 +25,11 @@ class StudentCourseLink(SQLModel, table=True):
     __tablename__ = "student_course_links"
 
     student_id: int = Field(foreign_key="students.id", primary_key=True)
-    course_id: int = Field(foreign_key="courses.id", primary_key=True)
-    enrollment_date: datetime = Field(default=datetime.now)
+    # student_id leads the composite primary key, so lookups by student already
+    # use its index; lookups by course need one of their own
+    course_id: int = Field(foreign_key="courses.id", primary_key=True, index=True)
+    # default_factory, not default: default=datetime.now would store the function
+    enrollment_date: datetime = Field(default_factory=datetime.now)
 
     # Relationships to both sides
     student: "Student" = Relationship(back_populates="course_links")
@@ -32,10 +50,11 @@ class Student(SQLModel, table=True):
     # Relationship to the association table
     course_links: List[StudentCourseLink] = Relationship(back_populates="student")
 
-    # Convenience property to access courses directly
-    @property
-    def courses(self) -> List["Course"]:
-        return [link.course for link in self.course_links]
+    # Read-only shortcut to the courses, straight through the link table
+    # (enrollments are still written through the link objects)
+    courses: List["Course"] = Relationship(
+        link_model=StudentCourseLink, sa_relationship_kwargs={"viewonly": True}
+    )
 
     def __repr__(self) -> str:
         return f"Student(id={self.id}, name={self.name}, email={self.email})"
@@ -52,15 +71,21 @@ class Course(SQLModel, table=True):
     # Relationship to the association table
     student_links: List[StudentCourseLink] = Relationship(back_populates="course")
 
-    # Convenience property to access students directly
-    @property
-    def students(self) -> List[Student]:
-        return [link.student for link in self.student_links]
+    # Read-only shortcut to the students, straight through the link table
+    # (enrollments are still written through the link objects)
+    students: List[Student] = Relationship(
+        link_model=StudentCourseLink, sa_relationship_kwargs={"viewonly": True}
+    )
 
     def __repr__(self) -> str:
         return f"Course(id={self.id}, title={self.title})"
 
 
+# Index on the courses' natural key, declared on its own so that the import can
+# drop it while loading the rows and build it once, afterwards
+course_title_index = Index("ix_courses_title", Course.title)
+
+
 def create_sample_dataframes() -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     """Create sample pandas DataFrames for students, courses, and enrollments."""
 
@@ -147,6 +172,19 @@ def create_sample_dataframes() -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame
     return students_df, courses_df, enrollments_df
 
 
+def _fast_insert(table, conn, keys, data_iter) -> None:
+    """`DataFrame.to_sql()` insert method: one DBAPI executemany() per chunk."""
+    # The rows go to the driver as plain tuples, with no per-row SQLAlchemy
+    # processing
+    columns = ", ".join(keys)
+    placeholders = ", ".join(["?"] * len(keys))
+    cursor = conn.connection.cursor()
+    cursor.executemany(
+        f"INSERT INTO {table.name} ({columns}) VALUES ({placeholders})", data_iter
+    )
+    cursor.close()
+
+
 def populate_from_dataframes(
     engine,
     students_df: pd.DataFrame,
@@ -155,57 +193,77 @@ def populate_from_dataframes(
 ) -> None:
     """Populate the database from pandas DataFrames."""
 
-    with Session(engine) as session:
+    # Run the whole import in a single transaction, committed once at the end,
+    # on a plain Core connection: no ORM session, so no unit of work to flush
+    with engine.begin() as conn:
         # Check if we already have data
-        result = session.exec(select(Course)).first()
+        result = conn.execute(select(Course.id)).first()
         if result:
             print("☝️ Database already contains data. Skipping import")
             return
 
-        # Step 1: Create mappings to track objects by their natural keys
-        student_map = {}
-        course_map = {}
-
-        # Step 2: Insert students and build the student mapping
-        for _, row in students_df.iterrows():
-            student = Student(name=row["name"], email=row["email"])
-            session.add(student)
-            session.flush()  # Get the database assigned id
-            student_map[student.email] = student
-
-        # Step 3: Insert courses and build the course mapping
-        for _, row in courses_df.iterrows():
-            course = Course(title=row["title"], description=row["description"])
-            session.add(course)
-            session.flush()
-            course_map[course.title] = course
-
-        # Step 4: Create the enrollments (many-to-many links)
-        for _, row in enrollments_df.iterrows():
-            student_email = row["student_email"]
-            course_title = row["course_title"]
-            enrollment_date = datetime.strptime(row["enrollment_date"], "%Y-%m-%d")
-
-            # Look up the student and course by their natural keys
-            student = student_map.get(student_email)
-            course = course_map.get(course_title)
-
-            # ⚠️ Skip if either is not found
-            if student is None:
-                print(f"❌ Warning: Student with email '{student_email}' not found")
-                continue
-            if course is None:
-                print(f"❌ Warning: Course with title '{course_title}' not found")
-                continue
-
-            # Create the link
-            link = StudentCourseLink(
-                student=student, course=course, enrollment_date=enrollment_date
+        # Step 1: Load students and courses straight from the DataFrames,
+        # bypassing the ORM: each chunk of 10 000 rows goes to a single DBAPI
+        # executemany() call, over the same connection so they stay in the
+        # same transaction (the course title index, if any, is dropped meanwhile,
+        # then rebuilt in one pass)
+        course_title_index.drop(conn, checkfirst=True)
+        for df, model in ((students_df, Student), (courses_df, Course)):
+            df.to_sql(
+                model.__tablename__,
+                conn,
+                if_exists="append",
+                index=False,
+                method=_fast_insert,
+                chunksize=10_000,
             )
-            session.add(link)
+        course_title_index.create(conn, checkfirst=True)
+
+        # Step 2: Read back the ids assigned by the database, as Series indexed
+        # by the natural keys the enrollments refer to
+        student_ids = pd.DataFrame(
+            conn.execute(select(Student.email, Student.id)).all(),
+            columns=["email", "id"],
+        ).set_index("email")["id"]
+        course_ids = pd.DataFrame(
+            conn.execute(select(Course.title, Course.id).order_by(Course.id)).all(),
+            columns=["title", "id"],
+        ).set_index("title")["id"]
+        # Course titles are not unique: like a dict, keep the last course of each title
+        course_ids = course_ids[~course_ids.index.duplicated(keep="last")]
+
+        # Step 3: Resolve each enrollment's student_id and course_id with
+        # vectorized lookups
+        links_df = enrollments_df.assign(
+            student_id=enrollments_df["student_email"].map(student_ids),
+            course_id=enrollments_df["course_title"].map(course_ids),
+        )
+
+        # ⚠️ Skip the enrollments whose student or course is not found
+        missing_student = links_df["student_id"].isna()
+        missing_course = links_df["course_id"].isna()
+        for student_email in links_df.loc[missing_student, "student_email"]:
+            print(f"❌ Warning: Student with email '{student_email}' not found")
+        for course_title in links_df.loc[
+            ~missing_student & missing_course, "course_title"
+        ]:
+            print(f"❌ Warning: Course with title '{course_title}' not found")
+
+        # Parse the whole enrollment_date column at once
+        links_df = (
+            links_df[~(missing_student | missing_course)]
+            .drop(columns=["student_email", "course_title"])
+            .astype({"student_id": int, "course_id": int})
+            .assign(
+                enrollment_date=lambda df: pd.to_datetime(
+                    df["enrollment_date"], format="%Y-%m-%d", cache=True
+                )
+            )
+        )
+
+        # Step 4: Insert all the enrollments (many-to-many links) the same way
+        conn.execute(insert(StudentCourseLink), links_df.to_dict(orient="records"))
 
-        # Commit all changes
-        session.commit()
         print(
             "✅ Successfully imported students, courses and enrollments from DataFrames"
         )
@@ -215,10 +273,14 @@ def verify_import(engine) -> None:
     """Query the database to verify the import worked correctly."""
 
     with Session(engine) as session:
-        # 1️⃣ Count records in each table
-        student_count = len(session.exec(select(Student)).all())
-        course_count = len(session.exec(select(Course)).all())
-        enrollment_count = len(session.exec(select(StudentCourseLink)).all())
+        # 1️⃣ Count records in each table with a single query
+        student_count, course_count, enrollment_count = session.exec(
+            select(
+                select(func.count()).select_from(Student).scalar_subquery(),
+                select(func.count()).select_from(Course).scalar_subquery(),
+                select(func.count()).select_from(StudentCourseLink).scalar_subquery(),
+            )
+        ).one()
 
         print("\n1️⃣ Database contains:")
         print(f"- {student_count} students")
@@ -227,29 +289,63 @@ def verify_import(engine) -> None:
 
         # 2️⃣ Show courses for each student
         print("\n2️⃣=== Students and Their Courses ===")
-        students = session.exec(select(Student)).all()
+        # (students are streamed in batches of 200, each batch loading its links
+        # and their courses in one query per level)
+        students = session.exec(
+            select(Student)
+            .options(
+                selectinload(Student.course_links).selectinload(
+                    StudentCourseLink.course
+                )
+            )
+            .execution_options(yield_per=200)
+        )
 
+        # (one print() per student, rather than one per line)
         for student in students:
-            print(f"\nStudent: {student.name} ({student.email})")
-            print("\n👇 Courses enrolled")
+            lines = [
+                f"\nStudent: {student.name} ({student.email})",
+                "\n👇 Courses enrolled",
+            ]
             for link in student.course_links:
-                print(
+                lines.append(
                     f"    - {link.course.title} "
                     f"(enrolled on {link.enrollment_date.strftime('%Y-%m-%d')})"
                 )
+            print("\n".join(lines))
 
         # 3️⃣ Show students for each course
         print("\n3️⃣=== Courses and Enrolled Students ===")
-        courses = session.exec(select(Course)).all()
+        courses = session.exec(
+            select(Course)
+            .options(
+                selectinload(Course.student_links).selectinload(
+                    StudentCourseLink.student
+                )
+            )
+            .execution_options(yield_per=200)
+        )
 
         for course in courses:
-            print(f"\nCourse: {course.title}")
-            print("👇 Students enrolled:")
+            lines = [f"\nCourse: {course.title}", "👇 Students enrolled:"]
             for link in course.student_links:
-                print(
+                lines.append(
                     f"  - {link.student.name} "
                     f"(enrolled on {link.enrollment_date.strftime('%Y-%m-%d')})"
                 )
+            print("\n".join(lines))
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Tune every new SQLite connection for bulk loading."""
+    cursor = dbapi_connection.cursor()
+    # Write-ahead logging, with fewer fsyncs
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    # Keep temporary data in memory and allow a page cache of about 200 MB
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-200000")
+    cursor.close()
 
 
 def main() -> None:
@@ -266,11 +362,19 @@ def main() -> None:
     print("\nSample Enrollment Data:")
     print(enrollments_df.head())
 
-    # Create SQLite database engine
-    engine = create_engine("sqlite:///university_from_pandas_sqlmodel.db", echo=True)
-
-    # Create all tables in the database
-    SQLModel.metadata.create_all(engine)
+    # Create SQLite database engine (set DB_ECHO=1 to log the emitted SQL)
+    engine = create_engine(
+        "sqlite:///university_from_pandas_sqlmodel.db",
+        echo=os.getenv("DB_ECHO", "false") in ("true", "1", "t"),
+        # Single-threaded script: every session reuses one cached connection
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    event.listen(engine, "connect", set_sqlite_pragmas)
+
+    # Create all tables in the database, on the first run only
+    if not inspect(engine).has_table("courses"):
+        SQLModel.metadata.create_all(engine, checkfirst=False)
 
     # Populate database from DataFrames
     populate_from_dataframes(engine, students_df, courses_df, enrollments_df)
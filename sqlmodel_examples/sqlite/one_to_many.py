@@ -1,5 +1,9 @@
+import os
 from typing import List, Optional
 
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.pool import StaticPool
 from sqlmodel import Field, Relationship, Session, SQLModel, create_engine, select
 
 
@@ -8,7 +12,7 @@ class Teacher(SQLModel, table=True):
     __tablename__ = "teachers"
 
     id: Optional[int] = Field(default=None, primary_key=True)
-    name: str
+    name: str = Field(index=True)
     subject: str
 
     # Relationship: one teacher has many students
@@ -27,8 +31,10 @@ class Student(SQLModel, table=True):
     name: str
     grade: int
 
-    # Foreign key
-    teacher_id: Optional[int] = Field(default=None, foreign_key="teachers.id")
+    # Foreign key (indexed: SQLite does not index foreign keys on its own)
+    teacher_id: Optional[int] = Field(
+        default=None, foreign_key="teachers.id", index=True
+    )
 
     # Relationship: many students have one teacher
     teacher: Optional[Teacher] = Relationship(back_populates="students")
@@ -37,15 +43,31 @@ class Student(SQLModel, table=True):
         return f"Student(id={self.id}, name={self.name}, grade={self.grade})"
 
 
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Use write-ahead logging and fewer fsyncs on every new SQLite connection."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
 def main():
-    # Create SQLite database engine
-    engine = create_engine("sqlite:///school_sqlmodel.db", echo=True)
+    # Create SQLite database engine (set DB_ECHO=1 to log the emitted SQL)
+    engine = create_engine(
+        "sqlite:///school_sqlmodel.db",
+        echo=os.getenv("DB_ECHO", "false") in ("true", "1", "t"),
+        # Single-threaded script: every session reuses one cached connection
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    event.listen(engine, "connect", set_sqlite_pragmas)
 
     # Create all tables in the database
     SQLModel.metadata.create_all(engine)
 
-    # Create a session to interact with the database
-    with Session(engine) as session:
+    # Create a session to interact with the database, inside a single transaction
+    # that is committed once, at the end of the block
+    with Session(engine) as session, session.begin():
         # Check if we already have data
         result = session.exec(select(Teacher)).first()
         if result is None:
@@ -60,12 +82,6 @@ def main():
             # Add the teacher to the session (students will be added automatically)
             session.add(math_teacher)
 
-            # Commit the changes
-            session.commit()
-
-            # 👇 Refresh the teacher to ensure relationships are loaded
-            session.refresh(math_teacher)
-
         # Query and demonstrate the relationship
         # 1️⃣ Get all teachers
         print("\n1️⃣ === All Teachers ===")
@@ -76,7 +92,9 @@ def main():
         # 2️⃣ Get a specific teacher
         print("\n2️⃣ === Ms. Johnson and her students ===")
         math_teacher = session.exec(
-            select(Teacher).where(Teacher.name == "Ms. Johnson")
+            select(Teacher)
+            .where(Teacher.name == "Ms. Johnson")
+            .options(selectinload(Teacher.students))
         ).one()
         print(f"Teacher: {math_teacher.name}, Subject: {math_teacher.subject}")
 
@@ -87,7 +105,11 @@ def main():
 
         # 4️⃣ We can also start from students and find their teacher
         print("\n4️⃣ === Alice and her teacher ===")
-        alice = session.exec(select(Student).where(Student.name == "Alice")).one()
+        alice = session.exec(
+            select(Student)
+            .where(Student.name == "Alice")
+            .options(joinedload(Student.teacher))
+        ).one()
         print(f"Student: {alice.name}, Grade: {alice.grade}")
         print(f"Teacher: {alice.teacher.name}, Subject: {alice.teacher.subject}")
 
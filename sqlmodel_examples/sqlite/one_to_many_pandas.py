@@ -1,9 +1,25 @@
 # sqlmodel_examples/one_to_many_pandas.py
 
+import os
+from itertools import groupby
+
 import pandas as pd
 from typing import List, Optional
 
-from sqlmodel import Field, Relationship, Session, SQLModel, create_engine, select
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
+from sqlmodel import (
+    Field,
+    Index,
+    Relationship,
+    Session,
+    SQLModel,
+    create_engine,
+    func,
+    inspect,
+    select,
+    text,
+)
 
 
 # Define our Teacher model
@@ -21,6 +37,11 @@ class Teacher(SQLModel, table=True):
         return f"Teacher(id={self.id}, name={self.name}, subject={self.subject})"
 
 
+# Index on the teachers' natural key, declared on its own so that the import can
+# drop it while loading the rows and build it once, afterwards
+teacher_name_index = Index("ix_teachers_name", Teacher.name)
+
+
 # Define our Student model
 class Student(SQLModel, table=True):
     __tablename__ = "students"
@@ -29,8 +50,13 @@ class Student(SQLModel, table=True):
     name: str
     grade: int
 
-    # Foreign key
-    teacher_id: Optional[int] = Field(default=None, foreign_key="teachers.id")
+    # Foreign key (indexed: SQLite does not index foreign keys on its own)
+    teacher_id: Optional[int] = Field(
+        default=None, foreign_key="teachers.id", index=True
+    )
+    # Copy of the teacher's name, so that listing students by teacher needs no
+    # join with the teachers table
+    teacher_name: str = Field(index=True)
 
     # Relationship: many students have one teacher
     teacher: Optional[Teacher] = Relationship(back_populates="students")
@@ -79,51 +105,80 @@ def create_sample_dataframes():
     return teachers_df, students_df
 
 
+def _fast_insert(table, conn, keys, data_iter) -> None:
+    """`DataFrame.to_sql()` insert method: one DBAPI executemany() per chunk."""
+    # The rows go to the driver as plain tuples, with no per-row SQLAlchemy
+    # processing
+    columns = ", ".join(keys)
+    placeholders = ", ".join(["?"] * len(keys))
+    cursor = conn.connection.cursor()
+    cursor.executemany(
+        f"INSERT INTO {table.name} ({columns}) VALUES ({placeholders})", data_iter
+    )
+    cursor.close()
+
+
 def populate_from_dataframes(engine, teachers_df, students_df):
     """Populate the database from pandas DataFrames."""
 
-    with Session(engine) as session:
+    # Run the whole import in a single transaction, committed once at the end
+    with Session(engine) as session, session.begin():
         # Check if we already have data
         result = session.exec(select(Teacher)).first()
         if result is not None:
             print("Database already contains data. Skipping import.")
             return
 
-        # Step 1: Create a dictionary to map teacher names to teacher objects
-        teacher_map = {}
-
-        # Step 2: Insert teachers and build the mapping
-        for _, row in teachers_df.iterrows():
-            teacher = Teacher(name=row["name"], subject=row["subject"])
-            session.add(teacher)
-            # We need to flush to get the ID assigned by the database
-            session.flush()
-            # Store teacher object in our map for later reference
-            teacher_map[teacher.name] = teacher
-
-        # Step 3: Insert students, referencing the appropriate teacher
-        for _, row in students_df.iterrows():
-            # Look up the teacher by name
-            teacher_name = row["teacher_name"]
-            teacher = teacher_map.get(teacher_name)
-
-            if teacher is None:
-                print(
-                    f"❌ Warning: Teacher '{teacher_name}' not found,\n"
-                    f"skipping student '{row['name']}'"
-                )
-                continue
+        # Step 1: Load the teachers straight from the DataFrame, bypassing the ORM:
+        # each chunk of 10 000 rows goes to a single DBAPI executemany() call,
+        # over the session's connection so they stay in the same transaction
+        # (their name index, if any, is dropped meanwhile, then rebuilt in one pass)
+        teacher_name_index.drop(session.connection(), checkfirst=True)
+        teachers_df.to_sql(
+            Teacher.__tablename__,
+            session.connection(),
+            if_exists="append",
+            index=False,
+            method=_fast_insert,
+            chunksize=10_000,
+        )
+        teacher_name_index.create(session.connection(), checkfirst=True)
+
+        # Step 2: Read back the ids assigned by the database, as a Series indexed
+        # by teacher name
+        teacher_ids = pd.DataFrame(
+            session.exec(select(Teacher.name, Teacher.id).order_by(Teacher.id)).all(),
+            columns=["name", "id"],
+        ).set_index("name")["id"]
+        # Teacher names are not unique: like a dict, keep the last teacher of each name
+        teacher_ids = teacher_ids[~teacher_ids.index.duplicated(keep="last")]
+
+        # Step 3: Resolve each student's teacher_id with a single vectorized lookup
+        students_df = students_df.assign(
+            teacher_id=students_df["teacher_name"].map(teacher_ids)
+        )
 
-            # Create the student linked to the teacher
-            student = Student(
-                name=row["name"],
-                grade=row["grade"],
-                teacher=teacher,  # This sets both the relationship and teacher_id
+        missing = students_df["teacher_id"].isna()
+        for name, teacher_name in students_df.loc[
+            missing, ["name", "teacher_name"]
+        ].itertuples(index=False, name=None):
+            print(
+                f"❌ Warning: Teacher '{teacher_name}' not found,\n"
+                f"skipping student '{name}'"
             )
-            session.add(student)
 
-        # Commit all changes
-        session.commit()
+        students_df = students_df[~missing].astype({"teacher_id": int})
+
+        # Step 4: Load the students the same way, teacher_name column included
+        students_df.to_sql(
+            Student.__tablename__,
+            session.connection(),
+            if_exists="append",
+            index=False,
+            method=_fast_insert,
+            chunksize=10_000,
+        )
+
         print("Successfully imported teachers and students from DataFrames.")
 
 
@@ -131,22 +186,59 @@ def verify_import(engine):
     """Query the database to verify the import worked correctly."""
 
     with Session(engine) as session:
-        # Count teachers and students
-        teacher_count = len(session.exec(select(Teacher)).all())
-        student_count = len(session.exec(select(Student)).all())
+        # Count teachers and students in a single query
+        teacher_count, student_count = session.exec(
+            select(
+                select(func.count()).select_from(Teacher).scalar_subquery(),
+                select(func.count()).select_from(Student).scalar_subquery(),
+            )
+        ).one()
 
         print(
             f"\nDatabase contains {teacher_count} teachers and {student_count} students."
         )
 
-        # Show each teacher and their students
-        teachers = session.exec(select(Teacher)).all()
-
-        for teacher in teachers:
-            print(f"\nTeacher: {teacher.name} (Subject: {teacher.subject})")
-            print("👇 Students:")
-            for student in teacher.students:
-                print(f"  - {student.name}: Grade {student.grade}")
+        # Show each teacher and their students: the students are read in a single
+        # scan of their own table, sorted by the teacher name they carry, and
+        # grouped by it; the groups are then matched, in the same order, against
+        # the teachers (so that a teacher with no students still gets a heading)
+        teachers = session.exec(
+            select(Teacher.name, Teacher.subject).order_by(Teacher.name, Teacher.id)
+        ).all()
+        students = groupby(
+            session.exec(
+                select(Student.teacher_name, Student.name, Student.grade)
+                .where(Student.teacher_name.is_not(None))
+                .order_by(Student.teacher_name, Student.id)
+                .execution_options(yield_per=200)
+            ),
+            key=lambda row: row[0],
+        )
+        group = next(students, None)
+
+        # (one print() per teacher, rather than one per line)
+        for teacher_name, subject in teachers:
+            lines = [f"\nTeacher: {teacher_name} (Subject: {subject})", "👇 Students:"]
+            # Skip the students whose teacher_name matches no teacher
+            while group is not None and group[0] < teacher_name:
+                group = next(students, None)
+            if group is not None and group[0] == teacher_name:
+                _, rows = group
+                lines.extend(f"  - {name}: Grade {grade}" for _, name, grade in rows)
+                group = next(students, None)
+            print("\n".join(lines))
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Tune every new SQLite connection for bulk loading."""
+    cursor = dbapi_connection.cursor()
+    # Write-ahead logging, with fewer fsyncs
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    # Keep temporary data in memory and allow a page cache of about 200 MB
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-200000")
+    cursor.close()
 
 
 def main():
@@ -159,11 +251,36 @@ def main():
     print("\nSample Student Data:")
     print(students_df.head())
 
-    # Create SQLite database engine
-    engine = create_engine("sqlite:///school_sqlmodel_from_pandas.db", echo=True)
-
-    # Create all tables in the database
-    SQLModel.metadata.create_all(engine)
+    # Create SQLite database engine (set DB_ECHO=1 to log the emitted SQL)
+    engine = create_engine(
+        "sqlite:///school_sqlmodel_from_pandas.db",
+        echo=os.getenv("DB_ECHO", "false") in ("true", "1", "t"),
+        # Single-threaded script: every session reuses one cached connection
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    event.listen(engine, "connect", set_sqlite_pragmas)
+
+    # Create all tables in the database, on the first run only
+    inspector = inspect(engine)
+    if not inspector.has_table("teachers"):
+        SQLModel.metadata.create_all(engine, checkfirst=False)
+    elif "teacher_name" not in {
+        column["name"] for column in inspector.get_columns("students")
+    }:
+        # Databases created before students carried their teacher's name get the
+        # column, filled in from the teachers table
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE students ADD COLUMN teacher_name VARCHAR"))
+            conn.execute(
+                text(
+                    "UPDATE students SET teacher_name = (SELECT name FROM teachers "
+                    "WHERE teachers.id = students.teacher_id)"
+                )
+            )
+            conn.execute(
+                text("CREATE INDEX ix_students_teacher_name ON students (teacher_name)")
+            )
 
     # Populate database from DataFrames
     populate_from_dataframes(engine, teachers_df, students_df)